@@ -1,8 +1,15 @@
+import functools
 import os
 from dataclasses import dataclass
+from pathlib import Path
 
 
-@dataclass
+# Local caches (LLM responses, Pexels searches and assets) live under here
+CACHE_DIR = Path.home() / ".cache" / "ytautomator"
+
+
+# Frozen because get_config() hands the same instance to every caller
+@dataclass(frozen=True)
 class AppConfig:
     timezone: str
     video_width: int
@@ -14,8 +21,12 @@ class AppConfig:
     topic_seed: str | None
     content_style: str
     use_google_tts: bool
+    parallel_tts: bool
+    tts_concurrency: int
     voice_id: str | None
     hashtags_count: int
+    llm_cache: bool
+    llm_cache_semantic: bool
 
     gemini_api_key: str | None
     elevenlabs_api_key: str | None
@@ -23,6 +34,7 @@ class AppConfig:
     youtube_channel_id: str | None
 
 
+@functools.lru_cache(maxsize=1)
 def get_config() -> AppConfig:
     return AppConfig(
         timezone=os.getenv("TIMEZONE", "America/New_York"),
@@ -35,10 +47,20 @@ def get_config() -> AppConfig:
         topic_seed=os.getenv("TOPIC_SEED") or None,
         content_style=os.getenv("CONTENT_STYLE", "default"),
         use_google_tts=os.getenv("USE_GOOGLE_TTS", "false").lower() == "true",
+        parallel_tts=os.getenv("PARALLEL_TTS", "true").lower() == "true",
+        tts_concurrency=max(1, int(os.getenv("TTS_CONCURRENCY", "2"))),
         voice_id=os.getenv("VOICE_ID") or None,
         hashtags_count=int(os.getenv("HASHTAGS_COUNT", "6")),
+        llm_cache=os.getenv("LLM_CACHE", "false").lower() == "true",
+        llm_cache_semantic=os.getenv("LLM_CACHE_SEMANTIC", "false").lower() == "true",
         gemini_api_key=os.getenv("GEMINI_API_KEY"),
         elevenlabs_api_key=os.getenv("ELEVENLABS_API_KEY"),
         pexels_api_key=os.getenv("PEXELS_API_KEY"),
         youtube_channel_id=os.getenv("YOUTUBE_CHANNEL_ID"),
     )
+
+
+def reload_config() -> AppConfig:
+    # Re-read the environment, e.g. after load_dotenv(override=True)
+    get_config.cache_clear()
+    return get_config()
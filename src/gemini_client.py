@@ -1,6 +1,10 @@
 from typing import Dict, List
-import google.generativeai as genai
+from google import genai
+from google.genai import types as genai_types
 import datetime
+import orjson
+
+from src.llm_cache import DAY, cached, today_bucket
 
 
 SYSTEM_PROMPT = (
@@ -18,86 +22,108 @@ DEFAULT_MODELS: List[str] = [
     "gemini-2.5-flash"
 ]
 
+# Process-wide client, built on first use after init_gemini
+_api_key: str | None = None
+_client: genai.Client | None = None
+
 
 def init_gemini(api_key: str | None):
+    global _api_key, _client
     if not api_key:
         raise RuntimeError("GEMINI_API_KEY not set")
-    genai.configure(api_key=api_key)
-
-
-def _get_model():
-    last_err = None
-    for name in DEFAULT_MODELS:
-        try:
-            model = genai.GenerativeModel(name)
-            return model
-        except Exception as e:
-            last_err = e
-            continue
-    raise RuntimeError(f"No Gemini model available. Last error: {last_err}")
+    if api_key != _api_key:
+        _api_key = api_key
+        _client = None
+
+
+def _get_client() -> genai.Client:
+    global _client
+    if _api_key is None:
+        raise RuntimeError("Gemini not initialised; call init_gemini first")
+    if _client is None:
+        _client = genai.Client(api_key=_api_key)
+    return _client
+
+
+async def _generate(prompt: str, prefix: str = "", **config):
+    # Extra keyword arguments go into GenerateContentConfig.
+    # Explicit context caching is not used: the shared prefix is ~100 tokens, far
+    # below the model's minimum cacheable size, so caches.create always fails.
+    return await _get_client().aio.models.generate_content(
+        model=DEFAULT_MODELS[0],
+        contents=prefix + prompt,
+        config=genai_types.GenerateContentConfig(**config) if config else None,
+    )
 
 
-def pick_topic_from_seed(seed: str, language: str) -> str:
-    model = _get_model()
+async def pick_topic_from_seed(seed: str, language: str) -> str:
     prompt = (
         f"Create a concise YouTube Shorts topic inspired by this theme: '{seed}'. "
         f"Keep it specific and catchy, under 10 words, in {language}. Return only the topic text."
     )
-    resp = model.generate_content(prompt)
+    resp = await _generate(prompt)
     topic = (resp.text or seed).strip().split("\n")[0]
     return topic
 
 
-def pick_trending_topic(category: str, language: str) -> str:
-    model = _get_model()
+@cached(ttl=DAY, bucket=today_bucket)
+async def pick_trending_topic(category: str, language: str) -> str:
     today = datetime.date.today().isoformat()
     prompt = (
         f"List 5 trending, evergreen-friendly short topics in {category} for YouTube Shorts "
         f"today ({today}) in {language}. Return only one best topic." 
     )
-    resp = model.generate_content(prompt)
+    resp = await _generate(prompt)
     topic = resp.text.strip().split("\n")[0]
     return topic
 
 
-def generate_script(topic: str, language: str, content_style: str = "default") -> Dict[str, List[Dict[str, str]]]:
-    model = _get_model()
+def _has_segments(result: Dict) -> bool:
+    # An empty or blocked reply parses to no segments; never cache that
+    return bool(result.get("segments"))
+
+
+@cached(ttl=7 * DAY, semantic_arg="topic", should_cache=_has_segments)
+async def generate_script(topic: str, language: str, content_style: str = "default") -> Dict[str, List[Dict[str, str]]]:
     style_prompt = SCIENCE_FACT_PROMPT
 
     prompt = (
-        f"{style_prompt}\n\n"
         f"Topic: {topic}\nLanguage: {language}\n"
         "Write a script as 6-10 short lines. Each line under 12 words."
         " Start with a catchy hook, include surprising facts, and end memorably."
         " Reply as JSON with an array 'segments', each having 'text'."
     )
-    resp = model.generate_content(prompt)
-    text = resp.text
-    import json, re
-    match = re.search(r"\{[\s\S]*\}", text)
-    if not match:
-        lines = [l.strip("- ") for l in text.splitlines() if l.strip()]
-        segments = [{"text": l} for l in lines[:10]]
-        return {"segments": segments}
-    try:
-        data = json.loads(match.group(0))
-        return data
-    except Exception:
-        lines = [l.strip("- ") for l in text.splitlines() if l.strip()]
-        segments = [{"text": l} for l in lines[:10]]
-        return {"segments": segments}
+    resp = await _generate(prompt, prefix=f"{style_prompt}\n\n")
+    return _parse_script(resp.text or "")
 
 
-def generate_hashtags(topic: str, language: str, content_style: str, max_count: int) -> List[str]:
-    model = _get_model()
+def _parse_script(text: str) -> Dict[str, List[Dict[str, str]]]:
+    # Same span the old r"\{[\s\S]*\}" match took (first "{" to last "}"), without the regex
+    start, end = text.find("{"), text.rfind("}")
+    if 0 <= start < end:
+        try:
+            return orjson.loads(text[start:end + 1])
+        except orjson.JSONDecodeError:
+            pass
+    lines = [l.strip("- ") for l in text.splitlines() if l.strip()]
+    segments = [{"text": l} for l in lines[:10]]
+    return {"segments": segments}
+
+
+@cached(ttl=7 * DAY, semantic_arg="topic")
+async def generate_hashtags(topic: str, language: str, content_style: str, max_count: int) -> List[str]:
     prompt = (
         f"Generate up to {max_count} short, trending-style hashtags for a YouTube Short.\n"
         f"Topic: {topic}\nLanguage: {language}\nStyle: {content_style}\n"
         "Rules: Only hashtags, no explanations. Prefer general but relevant tags."
     )
-    resp = model.generate_content(prompt)
+    resp = await _generate(prompt)
+    return _clean_hashtags((resp.text or "").split(), max_count)
+
+
+def _clean_hashtags(raw_tags: List[str], max_count: int) -> List[str]:
     tags = []
-    for raw in (resp.text or "").split():
+    for raw in raw_tags:
         tag = raw.strip().strip(",.;")
         if not tag:
             continue
@@ -115,3 +141,49 @@ def generate_hashtags(topic: str, language: str, content_style: str, max_count:
         if len(out) >= max_count:
             break
     return out
+
+
+_SCRIPT_AND_HASHTAGS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "segments": {
+            "type": "ARRAY",
+            "items": {"type": "OBJECT", "properties": {"text": {"type": "STRING"}}, "required": ["text"]},
+        },
+        "hashtags": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": ["segments", "hashtags"],
+}
+
+
+@cached(ttl=7 * DAY, semantic_arg="topic", should_cache=_has_segments)
+async def generate_script_and_hashtags(topic: str, language: str, content_style: str, max_tags: int) -> Dict[str, List]:
+    # One round-trip for both script and hashtags; the response schema makes the
+    # model reply with a single JSON object holding "segments" and "hashtags"
+    style_prompt = SCIENCE_FACT_PROMPT
+
+    prompt = (
+        f"Topic: {topic}\nLanguage: {language}\nStyle: {content_style}\n"
+        "Write a script as 6-10 short lines. Each line under 12 words."
+        " Start with a catchy hook, include surprising facts, and end memorably."
+        f" Also give up to {max_tags} short, trending-style hashtags for the Short;"
+        " prefer general but relevant tags."
+    )
+    resp = await _generate(
+        prompt,
+        prefix=f"{style_prompt}\n\n",
+        response_mime_type="application/json",
+        response_schema=_SCRIPT_AND_HASHTAGS_SCHEMA,
+    )
+    text = resp.text or ""
+    try:
+        data = orjson.loads(text)
+    except orjson.JSONDecodeError:
+        data = None
+    if not isinstance(data, dict):
+        return {"segments": _parse_script(text).get("segments", []), "hashtags": []}
+    tags = data.get("hashtags") or []
+    return {
+        "segments": data.get("segments") or [],
+        "hashtags": _clean_hashtags([str(t).replace(" ", "") for t in tags], max_tags),
+    }
@@ -0,0 +1,27 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# Network chunks are small; buffer file writes so a write syscall is issued per MiB
+WRITE_BUFFER_SIZE = 1 << 20
+STREAM_CHUNK_SIZE = 1 << 16
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        # Let callers see the final response so raise_for_status() behaves as before
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Shared across Pexels and ElevenLabs so repeated calls reuse pooled TCP/TLS connections
+SESSION = _build_session()
@@ -0,0 +1,186 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Callable, Iterator
+import contextlib
+import datetime
+import functools
+import hashlib
+import inspect
+import json
+import sqlite3
+import time
+
+from src.config import CACHE_DIR
+
+
+CACHE_PATH = CACHE_DIR / "llm.sqlite"
+SEMANTIC_MODEL = "all-MiniLM-L6-v2"
+SEMANTIC_THRESHOLD = 0.92
+
+DAY = 24 * 3600
+
+_settings: dict[str, Any] = {"enabled": False, "semantic": False, "path": CACHE_PATH}
+
+
+def configure(enabled: bool, semantic: bool = False, path: Path | None = None):
+    _settings.update(enabled=enabled, semantic=semantic, path=path or CACHE_PATH)
+
+
+def today_bucket() -> str:
+    return datetime.date.today().isoformat()
+
+
+@contextlib.contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    # One short-lived connection per lookup keeps this safe to use from worker threads
+    path: Path = _settings["path"]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, fn TEXT NOT NULL, value TEXT NOT NULL, "
+            "embedding TEXT, expires_at REAL NOT NULL, exact_key TEXT)"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+        if "exact_key" not in columns:
+            conn.execute("ALTER TABLE responses ADD COLUMN exact_key TEXT")
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@functools.lru_cache(maxsize=1)
+def _embedder():
+    # Optional dependency; semantic lookups are skipped when it is not installed
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        return None
+    return SentenceTransformer(SEMANTIC_MODEL)
+
+
+def _embed(text: str) -> list[float] | None:
+    model = _embedder()
+    if model is None:
+        return None
+    return [float(x) for x in model.encode(text, normalize_embeddings=True)]
+
+
+def _semantic_lookup(conn: sqlite3.Connection, fn_name: str, exact_key: str, embedding: list[float], now: float) -> str | None:
+    import numpy as np
+
+    # Only rows whose non-free-text arguments (language, counts, date bucket...)
+    # match exactly are candidates; the embedding just compares the free text
+    rows = conn.execute(
+        "SELECT value, embedding FROM responses "
+        "WHERE fn = ? AND exact_key = ? AND expires_at > ? AND embedding IS NOT NULL",
+        (fn_name, exact_key, now),
+    ).fetchall()
+    if not rows:
+        return None
+    query = np.asarray(embedding)
+    matrix = np.asarray([json.loads(e) for _, e in rows])
+    # Embeddings are stored normalized, so the dot product is the cosine similarity
+    scores = matrix @ query
+    best = int(scores.argmax())
+    return rows[best][0] if scores[best] >= SEMANTIC_THRESHOLD else None
+
+
+def _lookup(fn_name: str, key: str, exact_key: str | None, semantic_text: str | None) -> tuple[bool, Any, list[float] | None]:
+    now = time.time()
+    embedding = None
+    try:
+        with _connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row:
+                return True, json.loads(row[0]), None
+            if _settings["semantic"] and semantic_text is not None:
+                embedding = _embed(semantic_text)
+                if embedding is not None:
+                    hit = _semantic_lookup(conn, fn_name, exact_key, embedding, now)
+                    if hit is not None:
+                        return True, json.loads(hit), None
+    except sqlite3.Error as e:
+        print(f"LLM cache read failed: {e}")
+    return False, None, embedding
+
+
+def _store(fn_name: str, key: str, exact_key: str | None, result: Any, embedding: list[float] | None, ttl: float):
+    try:
+        with _connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, fn, value, embedding, expires_at, exact_key) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, fn_name, json.dumps(result, ensure_ascii=False),
+                 json.dumps(embedding) if embedding is not None else None, time.time() + ttl, exact_key),
+            )
+    except sqlite3.Error as e:
+        print(f"LLM cache write failed: {e}")
+
+
+def _hash(parts: Any) -> str:
+    src = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(src.encode("utf-8")).hexdigest()
+
+
+def cached(ttl: float, bucket: Callable[[], str] | None = None, semantic_arg: str | None = None,
+           should_cache: Callable[[Any], bool] = bool):
+    # Persist JSON-serializable results keyed by a hash of (function, args, kwargs).
+    # `bucket` adds a time component to the key, e.g. today_bucket for daily results.
+    # `semantic_arg` names the one free-text argument (e.g. "topic") that semantic
+    # mode may match by similarity; every other argument and the bucket must match
+    # exactly. Without it the function only gets exact hits. Results failing
+    # `should_cache` (by default: empty ones, e.g. a blocked reply) are returned but
+    # not stored, so the next call asks again. Works on both plain and async functions.
+    def decorator(fn):
+        fn_name = f"{fn.__module__}.{fn.__qualname__}"
+        signature = inspect.signature(fn)
+
+        def make_keys(args, kwargs) -> tuple[str, str | None, str | None]:
+            bucket_value = bucket() if bucket else None
+            key = _hash([fn_name, args, kwargs, bucket_value])
+            if semantic_arg is None:
+                return key, None, None
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            text = arguments.pop(semantic_arg, None)
+            exact_key = _hash([fn_name, arguments, bucket_value])
+            return key, exact_key, str(text) if text is not None else None
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not _settings["enabled"]:
+                    return await fn(*args, **kwargs)
+                key, exact_key, text = make_keys(args, kwargs)
+                hit, value, embedding = _lookup(fn_name, key, exact_key, text)
+                if hit:
+                    return value
+                result = await fn(*args, **kwargs)
+                if should_cache(result):
+                    _store(fn_name, key, exact_key, result, embedding, ttl)
+                return result
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _settings["enabled"]:
+                return fn(*args, **kwargs)
+            key, exact_key, text = make_keys(args, kwargs)
+            hit, value, embedding = _lookup(fn_name, key, exact_key, text)
+            if hit:
+                return value
+            result = fn(*args, **kwargs)
+            if should_cache(result):
+                _store(fn_name, key, exact_key, result, embedding, ttl)
+            return result
+
+        return wrapper
+
+    return decorator
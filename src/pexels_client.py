@@ -1,15 +1,32 @@
 from pathlib import Path
-import requests
+import asyncio
+import hashlib
+import os
+import shutil
+import aiohttp
+import diskcache
+import orjson
 from typing import List
 
+from src.config import CACHE_DIR
+from src.http_session import SESSION, STREAM_CHUNK_SIZE, WRITE_BUFFER_SIZE
 
+
+# Search results are reused for a day (keyed without the API key, so it is never
+# written to disk); downloaded files are kept by URL hash up to 2 GiB, evicting
+# the least recently used first
+_SEARCH_CACHE = diskcache.Cache(str(CACHE_DIR / "pexels_search"))
+_ASSET_CACHE = diskcache.Cache(str(CACHE_DIR / "pexels_assets"), size_limit=2 << 30, eviction_policy="least-recently-used")
+
+
+@_SEARCH_CACHE.memoize(expire=86400, ignore={0, "api_key"})
 def search_pexels_videos(api_key: str, query: str, per_page: int = 3) -> List[str]:
     url = "https://api.pexels.com/videos/search"
     headers = {"Authorization": api_key}
     params = {"query": query, "per_page": per_page, "orientation": "portrait"}
-    r = requests.get(url, headers=headers, params=params, timeout=30)
+    r = SESSION.get(url, headers=headers, params=params, timeout=30)
     r.raise_for_status()
-    data = r.json()
+    data = orjson.loads(r.content)
     urls: List[str] = []
     for v in data.get("videos", [])[:per_page]:
         files = v.get("video_files", [])
@@ -20,13 +37,14 @@ def search_pexels_videos(api_key: str, query: str, per_page: int = 3) -> List[st
     return urls
 
 
+@_SEARCH_CACHE.memoize(expire=86400, ignore={0, "api_key"})
 def search_pexels_photos(api_key: str, query: str, per_page: int = 5) -> List[str]:
     url = "https://api.pexels.com/v1/search"
     headers = {"Authorization": api_key}
     params = {"query": query, "per_page": per_page, "orientation": "portrait"}
-    r = requests.get(url, headers=headers, params=params, timeout=30)
+    r = SESSION.get(url, headers=headers, params=params, timeout=30)
     r.raise_for_status()
-    data = r.json()
+    data = orjson.loads(r.content)
     urls: List[str] = []
     for p in data.get("photos", [])[:per_page]:
         src = p.get("src", {})
@@ -37,17 +55,64 @@ def search_pexels_photos(api_key: str, query: str, per_page: int = 5) -> List[st
     return urls
 
 
-def download_files(urls: List[str], out_dir: Path) -> List[Path]:
-    paths: List[Path] = []
+def _asset_ext(url: str) -> str:
+    u = url.lower()
+    return ".mp4" if ".mp4" in u else (".jpg" if any(x in u for x in [".jpg", ".jpeg"]) else ".png")
+
+
+def _asset_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _restore_cached_asset(url: str, path: Path) -> bool:
+    handle = _ASSET_CACHE.get(_asset_key(url), read=True)
+    if handle is None:
+        return False
+    with handle:
+        if path.exists():
+            path.unlink()
+        # Large values are stored as files: hardlink them, copy when that is not possible
+        try:
+            os.link(handle.name, path)
+        except (AttributeError, OSError):
+            with open(path, "wb") as f:
+                shutil.copyfileobj(handle, f)
+    return True
+
+
+def _store_cached_asset(url: str, path: Path):
+    with open(path, "rb") as f:
+        _ASSET_CACHE.set(_asset_key(url), f, read=True)
+
+
+async def _download_one(session: aiohttp.ClientSession, url: str, path: Path) -> Path:
+    async with session.get(url) as r:
+        r.raise_for_status()
+        with open(path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+            async for chunk in r.content.iter_chunked(STREAM_CHUNK_SIZE):
+                if chunk:
+                    f.write(chunk)
+    # Copying the file into the cache is blocking disk I/O; keep it off the loop
+    # so the other downloads keep streaming
+    await asyncio.to_thread(_store_cached_asset, url, path)
+    return path
+
+
+async def download_files_async(urls: List[str], out_dir: Path) -> List[Path]:
     out_dir.mkdir(parents=True, exist_ok=True)
-    for i, url in enumerate(urls):
-        ext = ".mp4" if ".mp4" in url.lower() else (".jpg" if any(x in url.lower() for x in [".jpg", ".jpeg"]) else ".png")
-        p = out_dir / f"asset_{i}{ext}"
-        with requests.get(url, stream=True, timeout=60) as r:
-            r.raise_for_status()
-            with open(p, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-        paths.append(p)
+    paths = [out_dir / f"asset_{i}{_asset_ext(url)}" for i, url in enumerate(urls)]
+    pending = [(url, p) for url, p in zip(urls, paths) if not _restore_cached_asset(url, p)]
+    if not pending:
+        return paths
+    connector = aiohttp.TCPConnector(limit=8, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=60, sock_read=60)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        await asyncio.gather(*(_download_one(session, url, p) for url, p in pending))
     return paths
+
+
+def download_files(urls: List[str], out_dir: Path) -> List[Path]:
+    if not urls:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        return []
+    return asyncio.run(download_files_async(urls, out_dir))
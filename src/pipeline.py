@@ -1,13 +1,17 @@
 from __future__ import annotations
 from pathlib import Path
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Any
+import asyncio
 import re
 
-from src.config import get_config
-from src.gemini_client import init_gemini, pick_trending_topic, generate_script, pick_topic_from_seed, generate_hashtags
-from src.pexels_client import search_pexels_videos, search_pexels_photos, download_files
+from src.config import AppConfig, get_config
+from src.llm_cache import configure as configure_llm_cache
+from src.gemini_client import init_gemini, pick_trending_topic, pick_topic_from_seed, generate_script_and_hashtags
+from src.pexels_client import search_pexels_videos, search_pexels_photos, download_files_async
 from src.tts import concatenate_segments_to_audio
-from src.video_creator import create_video_with_subtitles
+from src.video_creator import create_video_with_subtitles_async
 from src.youtube_client import get_youtube_service, upload_short
 
 
@@ -23,12 +27,61 @@ _DOMAIN_KEYWORDS = {
     "inventions": ["invention", "engine", "machine", "robot", "technology", "device", "history of science"],
 }
 
+# One alternation per domain, scanned in C. No word boundaries: the keywords are
+# substring matches ("star" also hits "stars"), same as before.
+_DOMAIN_RE = {d: re.compile("|".join(map(re.escape, keys))) for d, keys in _DOMAIN_KEYWORDS.items()}
+
+_CLEAN = re.compile(r"[^a-z0-9\s]")
+
+# Pexels search queries per domain; "{t}" is the cleaned topic
+_QUERY_TEMPLATES = {
+    "space": (
+        "{t} space galaxy stars nebula night sky",
+        "cosmos galaxy nebula starfield space",
+        "planet earth nasa astronomy space",
+    ),
+    "ocean": (
+        "{t} ocean sea deep sea marine",
+        "bioluminescent ocean jellyfish marine",
+        "coral reef underwater ocean",
+    ),
+    "earth": (
+        "{t} volcano storm lightning nature",
+        "desert forest mountain nature",
+        "time lapse clouds sky",
+    ),
+    "animals": (
+        "{t} wildlife animal macro",
+        "wildlife closeup animal nature",
+        "bird mammal insect macro",
+    ),
+    "physics": (
+        "{t} physics particles light energy",
+        "quantum abstract particles light",
+        "magnet gravity waves",
+    ),
+    "inventions": (
+        "{t} invention technology device",
+        "gears machine engineering",
+        "robot circuit board technology",
+    ),
+    "science": (
+        "{t} science infographic macro",
+        "microscope cells macro science",
+        "abstract science background",
+    ),
+    "generic": (
+        "{t}",
+        "{t} abstract",
+    ),
+}
+
 
 def _detect_domain(topic: str, segments: list[dict[str, str]], content_style: str) -> tuple[str, list[str]]:
     text = (topic + "\n" + "\n".join(s.get("text", "") for s in segments)).lower()
-    for domain, keys in _DOMAIN_KEYWORDS.items():
-        if any(k in text for k in keys):
-            return domain, keys
+    for domain, rx in _DOMAIN_RE.items():
+        if rx.search(text):
+            return domain, _DOMAIN_KEYWORDS[domain]
     # default based on style
     if content_style == "science_fact":
         return "science", ["science", "infographic", "macro"]
@@ -36,52 +89,52 @@ def _detect_domain(topic: str, segments: list[dict[str, str]], content_style: st
 
 
 def _candidate_queries(topic: str, domain: str) -> list[str]:
-    topic_simple = re.sub(r"[^a-z0-9\s]", "", topic.lower()).strip()
-    seeds = {
-        "space": [
-            f"{topic_simple} space galaxy stars nebula night sky",
-            "cosmos galaxy nebula starfield space",
-            "planet earth nasa astronomy space",
-        ],
-        "ocean": [
-            f"{topic_simple} ocean sea deep sea marine",
-            "bioluminescent ocean jellyfish marine",
-            "coral reef underwater ocean",
-        ],
-        "earth": [
-            f"{topic_simple} volcano storm lightning nature",
-            "desert forest mountain nature",
-            "time lapse clouds sky",
-        ],
-        "animals": [
-            f"{topic_simple} wildlife animal macro",
-            "wildlife closeup animal nature",
-            "bird mammal insect macro",
-        ],
-        "physics": [
-            f"{topic_simple} physics particles light energy",
-            "quantum abstract particles light",
-            "magnet gravity waves",
-        ],
-        "inventions": [
-            f"{topic_simple} invention technology device",
-            "gears machine engineering",
-            "robot circuit board technology",
-        ],
-        "science": [
-            f"{topic_simple} science infographic macro",
-            "microscope cells macro science",
-            "abstract science background",
-        ],
-        "generic": [
-            topic_simple,
-            f"{topic_simple} abstract",
-        ],
-    }
-    return seeds.get(domain, seeds["generic"])
-
-
-def run_pipeline_once():
+    topic_simple = _CLEAN.sub("", topic.lower()).strip()
+    templates = _QUERY_TEMPLATES.get(domain, _QUERY_TEMPLATES["generic"])
+    return [tpl.format(t=topic_simple) for tpl in templates]
+
+
+@dataclass
+class PipelineContext:
+    # Long-lived handles shared by every run of a scheduler process, so OAuth and
+    # the YouTube discovery fetch happen once
+    yt_service: Any
+
+
+def build_context(cfg: AppConfig) -> PipelineContext:
+    init_gemini(cfg.gemini_api_key)
+    return PipelineContext(yt_service=get_youtube_service())
+
+
+def run_pipeline_once(ctx: PipelineContext | None = None):
+    # Gemini calls are native coroutines; the remaining blocking SDK calls run on
+    # the loop's default thread pool
+    asyncio.run(_run_pipeline_async(ctx))
+
+
+async def _search_assets(api_key: str, queries: list[str]) -> tuple[list[str], list[str]]:
+    video_urls: list[str] = []
+    image_urls: list[str] = []
+    for q in queries:
+        # Search videos and photos together; videos win when both return results
+        vs, is_ = await asyncio.gather(
+            asyncio.to_thread(search_pexels_videos, api_key, query=q, per_page=3),
+            asyncio.to_thread(search_pexels_photos, api_key, query=q, per_page=6),
+            return_exceptions=True,
+        )
+        if isinstance(vs, BaseException):
+            raise vs
+        video_urls.extend(vs)
+        if not video_urls:
+            if isinstance(is_, BaseException):
+                raise is_
+            image_urls.extend(is_)
+        if video_urls or image_urls:
+            break
+    return video_urls, image_urls
+
+
+async def _run_pipeline_async(ctx: PipelineContext | None):
     cfg = get_config()
 
     job_dir = OUTPUT_DIR / datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -89,37 +142,24 @@ def run_pipeline_once():
     tmp_dir = job_dir / "tmp"
     job_dir.mkdir(parents=True, exist_ok=True)
 
-    init_gemini(cfg.gemini_api_key)
+    configure_llm_cache(enabled=cfg.llm_cache, semantic=cfg.llm_cache_semantic)
+    if ctx is None:
+        init_gemini(cfg.gemini_api_key)
 
     if cfg.topic_seed:
-        topic = pick_topic_from_seed(cfg.topic_seed, cfg.language)
+        topic = await pick_topic_from_seed(cfg.topic_seed, cfg.language)
     else:
-        topic = pick_trending_topic(cfg.topic_category, cfg.language)
+        topic = await pick_trending_topic(cfg.topic_category, cfg.language)
 
-    script = generate_script(topic, cfg.language, content_style=cfg.content_style)
+    # Script and hashtags come back from a single Gemini call
+    script = await generate_script_and_hashtags(topic, cfg.language, cfg.content_style, cfg.hashtags_count)
     segments = script.get("segments", [])
+    hashtags = script.get("hashtags", [])
 
-    # Improved media selection: detect domain and iterate multiple queries until found
-    domain, _ = _detect_domain(topic, segments, cfg.content_style)
-    queries = _candidate_queries(topic, domain)
-
-    video_urls: list[str] = []
-    image_urls: list[str] = []
-    if cfg.pexels_api_key:
-        for q in queries:
-            if not video_urls:
-                vs = search_pexels_videos(cfg.pexels_api_key, query=q, per_page=3)
-                video_urls.extend(vs)
-            if not video_urls and not image_urls:
-                is_ = search_pexels_photos(cfg.pexels_api_key, query=q, per_page=6)
-                image_urls.extend(is_)
-            if video_urls or image_urls:
-                break
-
-    asset_urls = video_urls or image_urls
-    assets = download_files(asset_urls, assets_dir) if asset_urls else []
-
-    voiceover_path = concatenate_segments_to_audio(
+    # Narration only needs the script, so start it now and let the Pexels
+    # search and download run while it is being synthesized
+    tts_task = asyncio.create_task(asyncio.to_thread(
+        concatenate_segments_to_audio,
         segments=segments,
         voice="narrator",
         tmp_dir=tmp_dir,
@@ -127,10 +167,33 @@ def run_pipeline_once():
         api_key=cfg.elevenlabs_api_key,
         voice_id=cfg.voice_id,
         language=cfg.language,
-    )
+        parallel=cfg.parallel_tts,
+        max_workers=cfg.tts_concurrency,
+    ))
+
+    # Improved media selection: detect domain and iterate multiple queries until found
+    domain, _ = _detect_domain(topic, segments, cfg.content_style)
+    queries = _candidate_queries(topic, domain)
+
+    video_urls: list[str] = []
+    image_urls: list[str] = []
+    try:
+        if cfg.pexels_api_key:
+            video_urls, image_urls = await _search_assets(cfg.pexels_api_key, queries)
+        asset_urls = video_urls or image_urls
+
+        assets = await download_files_async(asset_urls, assets_dir)
+    except BaseException:
+        # Don't leave the narration task orphaned on the loop: cancel it and collect
+        # its outcome so its exception is not lost. A TTS request already in flight
+        # in the worker thread still finishes.
+        tts_task.cancel()
+        await asyncio.gather(tts_task, return_exceptions=True)
+        raise
+    voiceover_path = await tts_task
 
     out_video = job_dir / "short.mp4"
-    create_video_with_subtitles(
+    await create_video_with_subtitles_async(
         assets=assets,
         voiceover=voiceover_path,
         segments=segments,
@@ -141,11 +204,9 @@ def run_pipeline_once():
         out_path=out_video,
     )
 
-    hashtags = generate_hashtags(topic, cfg.language, cfg.content_style, cfg.hashtags_count)
-
-    youtube = get_youtube_service()
+    youtube = ctx.yt_service if ctx else await asyncio.to_thread(get_youtube_service)
     title = f"{topic} #Shorts"
     description = "Auto-generated short using AI.\n" + (" ".join(hashtags) if hashtags else "")
-    video_id = upload_short(youtube, out_video, title=title, description=description, tags=["shorts", cfg.topic_category, cfg.content_style])
+    video_id = await asyncio.to_thread(upload_short, youtube, out_video, title=title, description=description, tags=["shorts", cfg.topic_category, cfg.content_style])
 
     print(f"Uploaded video: https://youtube.com/shorts/{video_id}")
@@ -3,15 +3,16 @@ from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
 import pytz
 from src.config import get_config
-from src.pipeline import run_pipeline_once
+from src.pipeline import build_context, run_pipeline_once
 
 
 def run_scheduler():
     cfg = get_config()
+    # Gemini and the YouTube service are set up once, not per run
+    ctx = build_context(cfg)
     scheduler = BlockingScheduler(timezone=pytz.timezone(cfg.timezone))
 
-    for hour in (9, 14, 19):
-        scheduler.add_job(run_pipeline_once, CronTrigger(hour=hour, minute=0))
+    scheduler.add_job(run_pipeline_once, CronTrigger(hour="9,14,19", minute=0), args=[ctx])
 
     print(f"Scheduler started in timezone {cfg.timezone} for 09:00, 14:00, 19:00.")
     try:
@@ -1,14 +1,27 @@
 from pathlib import Path
 from typing import List, Dict
-import requests
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from src.http_session import SESSION, STREAM_CHUNK_SIZE, WRITE_BUFFER_SIZE
+
+
+# ElevenLabs narration is requested as raw 16-bit mono PCM so ffmpeg can read it
+# without an MP3 decode; consumers need the rate since the file has no header
+PCM_SAMPLE_RATE = 22050
+
+# The shared session's Retry does not cover POST, so rate-limited TTS requests
+# (ElevenLabs' per-plan concurrency limit) are retried here with backoff
+TTS_RETRY_STATUS = (429, 500, 502, 503, 504)
+TTS_MAX_ATTEMPTS = 5
 
 
 def tts_elevenlabs(api_key: str, text: str, voice_id: str | None, out_path: Path) -> Path:
     voice = voice_id or "21m00Tcm4TlvDq8ikWAM"
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice}/stream?optimize_streaming_latency=0"
+    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice}/stream"
+    params = {"optimize_streaming_latency": 0, "output_format": f"pcm_{PCM_SAMPLE_RATE}"}
     headers = {
         "xi-api-key": api_key,
-        "Accept": "audio/mpeg",
         "Content-Type": "application/json",
     }
     payload = {
@@ -20,16 +33,20 @@ def tts_elevenlabs(api_key: str, text: str, voice_id: str | None, out_path: Path
             "style": 0.3,
             "use_speaker_boost": True,
         },
-        "output_format": "mp3_44100_128",
     }
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    with requests.post(url, headers=headers, json=payload, stream=True, timeout=120) as r:
-        r.raise_for_status()
-        with open(out_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-    return out_path
+    for attempt in range(TTS_MAX_ATTEMPTS):
+        with SESSION.post(url, headers=headers, params=params, json=payload, stream=True, timeout=120) as r:
+            if r.status_code in TTS_RETRY_STATUS and attempt < TTS_MAX_ATTEMPTS - 1:
+                retry_after = r.headers.get("Retry-After", "")
+                time.sleep(float(retry_after) if retry_after.isdigit() else 2 ** attempt)
+                continue
+            r.raise_for_status()
+            with open(out_path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+                for chunk in r.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    if chunk:
+                        f.write(chunk)
+        return out_path
 
 
 def tts_google(text: str, out_path: Path, language_code: str = "en-US") -> Path:
@@ -46,14 +63,34 @@ def tts_google(text: str, out_path: Path, language_code: str = "en-US") -> Path:
     return out_path
 
 
-def concatenate_segments_to_audio(segments: List[Dict[str, str]], voice: str, tmp_dir: Path, use_google: bool, api_key: str | None, voice_id: str | None, language: str) -> Path:
-    # Join all text for a single TTS pass to keep pacing natural
-    text = " ".join([s.get("text", "") for s in segments])
-    out_mp3 = tmp_dir / f"voiceover_{voice}.mp3"
-    if use_google:
-        tts_google(text, out_mp3, language_code=f"{language}-US" if len(language) == 2 else language)
-    else:
-        if not api_key:
-            raise RuntimeError("ELEVENLABS_API_KEY missing and USE_GOOGLE_TTS is false")
-        tts_elevenlabs(api_key, text, voice_id, out_mp3)
-    return out_mp3
+def concatenate_segments_to_audio(segments: List[Dict[str, str]], voice: str, tmp_dir: Path, use_google: bool, api_key: str | None, voice_id: str | None, language: str, parallel: bool = False, max_workers: int = 2) -> Path:
+    # Google TTS returns MP3, ElevenLabs raw PCM (see PCM_SAMPLE_RATE)
+    ext = ".mp3" if use_google else ".pcm"
+    out_audio = tmp_dir / f"voiceover_{voice}{ext}"
+    if not use_google and not api_key:
+        raise RuntimeError("ELEVENLABS_API_KEY missing and USE_GOOGLE_TTS is false")
+    language_code = f"{language}-US" if len(language) == 2 else language
+
+    def synthesize(text: str, out_path: Path) -> Path:
+        if use_google:
+            return tts_google(text, out_path, language_code=language_code)
+        return tts_elevenlabs(api_key, text, voice_id, out_path)
+
+    texts = [t for t in ((s.get("text") or "").strip() for s in segments) if t]
+    if not parallel or len(texts) < 2:
+        # Join all text for a single TTS pass to keep pacing natural
+        text = " ".join([s.get("text", "") for s in segments])
+        synthesize(text, out_audio)
+        return out_audio
+
+    # One request per segment, in flight together. Both MP3 (a plain stream of
+    # MPEG frames) and headerless PCM can be joined byte-wise in segment order
+    parts = [tmp_dir / f"voiceover_{voice}_{i}{ext}" for i in range(len(texts))]
+    # Bounded by max_workers: ElevenLabs plans below Pro allow only a few concurrent requests
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(texts))) as ex:
+        list(ex.map(synthesize, texts, parts))
+    out_audio.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_audio, "wb") as out:
+        for part in parts:
+            out.write(part.read_bytes())
+    return out_audio
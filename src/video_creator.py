@@ -1,10 +1,25 @@
 from pathlib import Path
-from typing import List, Dict
+from typing import Awaitable, Callable, List, Dict
+import asyncio
+import fractions
+import functools
+import hashlib
+import json
+import math
 import subprocess
 import os
+import re
+import shutil
+import diskcache
 
-# MoviePy is only used for probing when needed; output is assembled with ffmpeg for reliability
-from moviepy.video.io.VideoFileClip import VideoFileClip
+# Optional: PyAV reads durations from the container header in-process
+try:
+	import av
+except ImportError:
+	av = None
+
+from src.config import CACHE_DIR
+from src.tts import PCM_SAMPLE_RATE
 
 
 def _quote_filter_str(s: str) -> str:
@@ -12,54 +27,221 @@ def _quote_filter_str(s: str) -> str:
 	return "'" + s.replace("'", r"\'") + "'"
 
 
-def _write_overlay_text(tmp_dir: Path, idx: int, text: str) -> Path:
-	path = tmp_dir / f"overlay_{idx}.txt"
-	path.parent.mkdir(parents=True, exist_ok=True)
-	with open(path, "w", encoding="utf-8") as f:
-		f.write(text or "")
-	return path
-
-
-def _build_drawtext_filter_from_file(textfile: Path) -> str:
-	# Avoid fontfile to reduce Windows parsing issues; rely on default font
-	options: list[str] = []
-	options.append(f"textfile={_quote_filter_str(textfile.resolve().as_posix())}")
-	options.extend([
-		"fontcolor=white",
-		"fontsize=24",
-		"borderw=2",
-		"bordercolor=black",
-		"x=(w-text_w)/2",
-		"y=(h-text_h)/2",
-		"line_spacing=8",
-		"box=1",
-		"boxcolor=black@0.3",
-		"boxborderw=12",
-	])
-	return "drawtext=" + ":".join(options)
-
-
-def _run_ffmpeg(cmd: list[str]) -> bool:
+def _ass_filter(ass_path: Path) -> str:
+	# libass renderer; the quoted filename keeps Windows drive colons intact
+	return f"ass=filename={_quote_filter_str(ass_path.resolve().as_posix())}"
+
+
+async def _run_ffmpeg_capture(cmd: list[str]) -> tuple[bool, str]:
 	try:
-		subprocess.run(cmd, check=True)
-		return True
+		proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+		_, stderr = await proc.communicate()
 	except Exception as e:
 		print(f"ffmpeg error: {e}")
+		return False, str(e)
+	err = stderr.decode("utf-8", "replace").strip()
+	if proc.returncode != 0:
+		print(f"ffmpeg error (exit {proc.returncode}): {err}")
+		_note_missing_filter(err)
+		return False, err
+	return True, err
+
+
+async def _run_ffmpeg_async(cmd: list[str]) -> bool:
+	ok, _ = await _run_ffmpeg_capture(cmd)
+	return ok
+
+
+# Filters that failed at runtime with "No such filter"; later commands leave them out
+_DISABLED_FILTERS: set[str] = set()
+_NO_SUCH_FILTER_RE = re.compile(r"No such filter: '?([\w-]+)'?")
+
+
+@functools.lru_cache(maxsize=1)
+def _available_filters() -> frozenset[str] | None:
+	# One `ffmpeg -filters` call per process; None when the list cannot be read
+	try:
+		result = subprocess.run(["ffmpeg", "-hide_banner", "-filters"], capture_output=True, text=True, check=False, timeout=30)
+	except Exception:
+		return None
+	names = {parts[1] for parts in (line.split() for line in result.stdout.splitlines()) if len(parts) >= 3 and "->" in parts[2]}
+	return frozenset(names) or None
+
+
+def _filter_ok(name: str) -> bool:
+	if name in _DISABLED_FILTERS:
+		return False
+	available = _available_filters()
+	return available is None or name in available
+
+
+def _note_missing_filter(stderr: str) -> str | None:
+	match = _NO_SUCH_FILTER_RE.search(stderr)
+	if not match:
+		return None
+	_DISABLED_FILTERS.add(match.group(1))
+	return match.group(1)
+
+
+def _nvenc_args(still: bool = False) -> list[str]:
+	return ["-c:v", "h264_nvenc", "-preset", "p4", "-tune", "ll" if still else "hq", "-rc", "vbr", "-cq", "23", "-b:v", "0", "-pix_fmt", "yuv420p"]
+
+
+@functools.lru_cache(maxsize=None)
+def _probe_encoder(codec_args: tuple[str, ...]) -> bool:
+	# Being listed in `ffmpeg -encoders` is not enough (distro builds ship h264_nvenc
+	# without a GPU, and p1-p7 presets / -tune need FFmpeg 4.3+), so encode a single
+	# frame with the exact arguments the real commands use
+	try:
+		result = subprocess.run([
+			"ffmpeg", "-v", "error",
+			"-f", "lavfi", "-i", "color=c=black:s=256x256:r=1",
+			"-frames:v", "1", *codec_args, "-f", "null", "-",
+		], capture_output=True, check=False, timeout=30)
+		return result.returncode == 0
+	except Exception:
 		return False
 
 
+def _has_nvenc() -> bool:
+	return _probe_encoder(tuple(_nvenc_args())) and _probe_encoder(tuple(_nvenc_args(still=True)))
+
+
+def _video_codec_args(still: bool = False) -> list[str]:
+	# Hardware H.264 when an NVIDIA encoder is usable, libx264 otherwise.
+	# `still` tunes for a static picture, which both encoders handle far faster
+	if _has_nvenc():
+		return _nvenc_args(still)
+	tune = ["-tune", "stillimage"] if still else []
+	return ["-c:v", "libx264", "-preset", "veryfast", *tune, "-pix_fmt", "yuv420p"]
+
+
+# CPUs this process may run on; ffmpeg's own default under-uses wide machines
+_THREADS = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 4)
+
+
+def _thread_args(threads: int = _THREADS) -> list[str]:
+	# Placed before the first -i: decoder threads plus the global filter thread counts.
+	# Encoder threads are an output option, so helpers with a budget repeat -threads before dst
+	return ["-threads", str(threads), "-filter_threads", str(threads), "-filter_complex_threads", str(threads)]
+
+
+def _hwaccel_input_args() -> list[str]:
+	# GPU decode for video inputs; frames are copied back so the CPU filters still apply
+	return ["-hwaccel", "cuda"] if _has_nvenc() else []
+
+
+def _ffprobe_entry(path: str, *selector: str) -> float | None:
+	try:
+		result = subprocess.run([
+			"ffprobe", "-v", "error", *selector,
+			"-of", "default=noprint_wrappers=1:nokey=1", path
+		], capture_output=True, text=True, check=True)
+		val = result.stdout.strip().splitlines()
+		return float(val[0]) if val and val[0] != "N/A" else None
+	except Exception:
+		return None
+
+
+def _probe_duration(path: str) -> float | None:
+	# PyAV reads the container in-process; the ffprobe subprocess is the fallback
+	if av is not None:
+		try:
+			with av.open(path) as container:
+				if container.duration:
+					return container.duration / av.time_base
+		except Exception:
+			pass
+	# Stream-level metadata comes from the header; the format duration may need
+	# a scan of the whole container, so it is only asked for when that is empty
+	duration = _ffprobe_entry(path, "-select_streams", "v:0", "-show_entries", "stream=duration")
+	if duration is None:
+		duration = _ffprobe_entry(path, "-show_entries", "format=duration")
+	return duration
+
+
+# In-process only: every probed file lives in a per-job directory, so a cache
+# persisted across runs would never be hit. (abspath, mtime_ns, size) lets an
+# edited or replaced file be probed again.
+@functools.lru_cache(maxsize=512)
+def _probe_duration_cached(abspath: str, mtime_ns: int, size: int) -> float | None:
+	return _probe_duration(abspath)
+
+
 def _ffprobe_duration_seconds(path: Path) -> float | None:
+	try:
+		st = path.stat()
+	except OSError:
+		return None
+	return _probe_duration_cached(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+@functools.lru_cache(maxsize=512)
+def _probe_stream_params_cached(abspath: str, mtime_ns: int, size: int) -> dict | None:
 	try:
 		result = subprocess.run([
-			"ffprobe", "-v", "error", "-show_entries", "format=duration",
-			"-of", "default=noprint_wrappers=1:nokey=1", str(path)
+			"ffprobe", "-v", "error", "-select_streams", "v:0",
+			"-show_entries", "stream=width,height,avg_frame_rate,codec_name,pix_fmt",
+			"-of", "json", abspath
 		], capture_output=True, text=True, check=True)
-		val = result.stdout.strip()
-		return float(val) if val else None
+		stream = json.loads(result.stdout)["streams"][0]
+		return {
+			"w": int(stream["width"]),
+			"h": int(stream["height"]),
+			"fps": fractions.Fraction(stream["avg_frame_rate"]) if stream.get("avg_frame_rate", "0/0") != "0/0" else None,
+			"codec": stream.get("codec_name"),
+			"pix_fmt": stream.get("pix_fmt"),
+		}
 	except Exception:
 		return None
 
 
+def _probe_stream_params(path: Path) -> dict | None:
+	try:
+		st = path.stat()
+	except OSError:
+		return None
+	return _probe_stream_params_cached(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+def _matches_target(path: Path, width: int, height: int, fps: int) -> bool:
+	# Already what the encoder would produce, so a remux gives the same result
+	params = _probe_stream_params(path)
+	return (
+		params is not None
+		and params["w"] == width and params["h"] == height
+		and params["fps"] == fps
+		and params["codec"] == "h264" and params["pix_fmt"] == "yuv420p"
+	)
+
+
+def _audio_input_args(audio: Path) -> list[str]:
+	# Raw PCM narration has no header, so describe it to ffmpeg explicitly
+	if audio.suffix.lower() == ".pcm":
+		return ["-f", "s16le", "-ar", str(PCM_SAMPLE_RATE), "-ac", "1", "-i", str(audio)]
+	return ["-i", str(audio)]
+
+
+def _audio_codec_args(loudnorm: bool = False) -> list[str]:
+	# Fixed AAC settings keep the output size predictable; +faststart puts the moov
+	# atom first so the upload can be processed as it arrives
+	args = ["-c:a", "aac", "-b:a", "128k", "-ac", "2", "-ar", "48000", "-movflags", "+faststart"]
+	if loudnorm:
+		# Single-pass EBU R128 normalization, folded into the mux instead of a separate pass
+		args = ["-af", "loudnorm=I=-16:LRA=11:TP=-1.5", *args]
+	return args
+
+
+def _audio_duration_seconds(audio: Path) -> float | None:
+	# 16-bit mono PCM: duration follows from the byte count, no probe needed
+	if audio.suffix.lower() == ".pcm":
+		try:
+			return audio.stat().st_size / (2 * PCM_SAMPLE_RATE)
+		except OSError:
+			return None
+	return _ffprobe_duration_seconds(audio)
+
+
 def _format_srt_timestamp(seconds: float) -> str:
 	# Format seconds into SRT timestamp: HH:MM:SS,mmm
 	hours = int(seconds // 3600)
@@ -69,41 +251,15 @@ def _format_srt_timestamp(seconds: float) -> str:
 	return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
 
 
-def _write_srt(tmp_dir: Path, segments: List[Dict[str, str]], durations: List[float]) -> Path:
-	path = tmp_dir / "subtitles.srt"
-	path.parent.mkdir(parents=True, exist_ok=True)
-	start = 0.0
-	with open(path, "w", encoding="utf-8") as f:
-		for idx, (seg, dur) in enumerate(zip(segments, durations), start=1):
-			text = (seg.get("text") or "").strip()
-			if not text:
-				start += dur
-				continue
-			end = start + dur
-			f.write(f"{idx}\n")
-			f.write(f"{_format_srt_timestamp(start)} --> {_format_srt_timestamp(end)}\n")
-			# SRT expects plain text lines. Enforce a maximum of two lines.
-			# If the text has multiple lines, flatten and re-wrap into up to two lines
-			# by splitting on words and balancing roughly.
-			single = " ".join([ln.strip() for ln in text.splitlines() if ln.strip()])
-			words = single.split()
-			if len(words) <= 0:
-				lines = [""]
-			elif len(words) <= 10:
-				# short text, keep as single line
-				lines = [single]
-			else:
-				# split into two roughly equal halves
-				half = len(words) // 2
-				# try to balance by moving boundary to nearest space that keeps line lengths similar
-				left = words[:half]
-				right = words[half:]
-				lines = [" ".join(left).strip(), " ".join(right).strip()]
-			for line in lines[:2]:
-				f.write(line + "\n")
-			f.write("\n")
-			start = end
-	return path
+def _layout_lines(text: str) -> list[str]:
+	# Subtitles show at most two lines: flatten the text and, when it is long,
+	# split the words into two roughly equal halves
+	single = " ".join([ln.strip() for ln in text.splitlines() if ln.strip()])
+	words = single.split()
+	if len(words) <= 10:
+		return [single]
+	half = len(words) // 2
+	return [" ".join(words[:half]).strip(), " ".join(words[half:]).strip()]
 
 
 def _format_ass_timestamp(seconds: float) -> str:
@@ -115,46 +271,49 @@ def _format_ass_timestamp(seconds: float) -> str:
 	return f"{hours:d}:{minutes:02d}:{secs:02d}.{cents:02d}"
 
 
-def _write_ass(tmp_dir: Path, segments: List[Dict[str, str]], durations: List[float]) -> Path:
-	path = tmp_dir / "subtitles.ass"
-	path.parent.mkdir(parents=True, exist_ok=True)
-	# Basic ASS header with a Default style centered and fontsize 24
-	header = [
-		"[Script Info]",
-		"ScriptType: v4.00+",
-		"PlayResX: 1920",
-		"PlayResY: 1080",
-		"",
-		"[V4+ Styles]",
-		"Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding",
-		"Style: Default,Arial,24,&H00FFFFFF,&H00FFFFFF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,1,5,10,10,10,1",
-		"",
-		"[Events]",
-		"Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
-	]
-	lines = []
+# Basic ASS header with a Default style centered and fontsize 24
+_ASS_HEADER = [
+	"[Script Info]",
+	"ScriptType: v4.00+",
+	"PlayResX: 1920",
+	"PlayResY: 1080",
+	"",
+	"[V4+ Styles]",
+	"Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding",
+	"Style: Default,Arial,24,&H00FFFFFF,&H00FFFFFF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,1,5,10,10,10,1",
+	"",
+	"[Events]",
+	"Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+]
+
+
+def _write_subtitles(tmp_dir: Path, segments: List[Dict[str, str]], durations: List[float]) -> tuple[Path, Path]:
+	# One pass over the segments emits both the SRT (soft-subs fallback) and the ASS (burned in)
+	srt_path = tmp_dir / "subtitles.srt"
+	ass_path = tmp_dir / "subtitles.ass"
+	tmp_dir.mkdir(parents=True, exist_ok=True)
+	srt_parts: list[str] = []
+	ass_lines: list[str] = []
 	start = 0.0
-	for seg, dur in zip(segments, durations):
+	for idx, (seg, dur) in enumerate(zip(segments, durations), start=1):
 		text = (seg.get("text") or "").strip()
 		if not text:
 			start += dur
 			continue
 		end = start + dur
-		# flatten and limit to two lines via the same logic as SRT
-		single = " ".join([ln.strip() for ln in text.splitlines() if ln.strip()])
-		words = single.split()
-		if len(words) <= 10:
-			out_lines = [single]
-		else:
-			half = len(words) // 2
-			out_lines = [" ".join(words[:half]).strip(), " ".join(words[half:]).strip()]
+		lines = _layout_lines(text)
+		srt_parts.append(f"{idx}\n")
+		srt_parts.append(f"{_format_srt_timestamp(start)} --> {_format_srt_timestamp(end)}\n")
+		for line in lines:
+			srt_parts.append(line + "\n")
+		srt_parts.append("\n")
 		# ASS line breaks are \N
-		ass_text = "\\N".join(out_lines[:2])
-		lines.append(f"Dialogue: 0,{_format_ass_timestamp(start)},{_format_ass_timestamp(end)},Default,,0,0,0,,{ass_text}")
+		ass_text = "\\N".join(lines)
+		ass_lines.append(f"Dialogue: 0,{_format_ass_timestamp(start)},{_format_ass_timestamp(end)},Default,,0,0,0,,{ass_text}")
 		start = end
-	with open(path, "w", encoding="utf-8") as f:
-		f.write("\n".join(header + lines))
-	return path
+	srt_path.write_bytes("".join(srt_parts).encode("utf-8"))
+	ass_path.write_bytes("\n".join(_ASS_HEADER + ass_lines).encode("utf-8"))
+	return srt_path, ass_path
 
 
 def _build_subtitles_filter_from_file(srtfile: Path, width: int, height: int) -> str:
@@ -180,251 +339,487 @@ def _build_subtitles_filter_from_file(srtfile: Path, width: int, height: int) ->
 	return f"subtitles={filename_part}:force_style='{style}'"
 
 
-def _reencode_with_ffmpeg(src: Path, dst: Path, width: int, height: int, fps: int, max_seconds: float | None = None, overlay_textfile: Path | None = None) -> bool:
+async def _reencode_with_ffmpeg(src: Path, dst: Path, width: int, height: int, fps: int, max_seconds: float | None = None, threads: int = _THREADS) -> bool:
 	dst.parent.mkdir(parents=True, exist_ok=True)
+	if await asyncio.to_thread(_matches_target, src, width, height, fps):
+		return await _trim_copy(src, dst, max_seconds if max_seconds is not None and max_seconds > 0 else None)
 	vf_parts = [
 		f"scale='min({width},iw)':'min({height},ih)':force_original_aspect_ratio=decrease",
 		f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color=black",
 		f"fps={fps}",
 	]
-	if overlay_textfile:
-		vf_parts.append(_build_drawtext_filter_from_file(overlay_textfile))
-	vf = ",".join(vf_parts)
 	cmd = [
 		"ffmpeg", "-y", "-v", "error",
+		*_thread_args(threads),
+		*_hwaccel_input_args(),
 		"-i", str(src),
-		"-vf", vf,
+		"-vf", ",".join(vf_parts),
 		"-r", str(fps),
 		"-an",
-		"-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+		*_video_codec_args(),
+		"-threads", str(threads),
 	]
 	if max_seconds is not None and max_seconds > 0:
 		cmd.extend(["-t", str(max_seconds)])
 	cmd.append(str(dst))
-	if _run_ffmpeg(cmd):
-		return True
-	# Retry without overlay if drawtext caused failure
-	if overlay_textfile:
-		vf_no = ",".join(vf_parts[:-1])
-		cmd_no = [
-			"ffmpeg", "-y", "-v", "error",
-			"-i", str(src),
-			"-vf", vf_no,
-			"-r", str(fps),
-			"-an",
-			"-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
-		]
-		if max_seconds is not None and max_seconds > 0:
-			cmd_no.extend(["-t", str(max_seconds)])
-		cmd_no.append(str(dst))
-		return _run_ffmpeg(cmd_no)
-	return False
+	return await _run_ffmpeg_async(cmd)
 
 
-def _image_to_video(src: Path, dst: Path, width: int, height: int, fps: int, seconds: int = 5, overlay_textfile: Path | None = None) -> bool:
+async def _image_to_video(src: Path, dst: Path, width: int, height: int, fps: int, seconds: int = 5, enable_kenburns: bool = False, threads: int = _THREADS) -> bool:
 	dst.parent.mkdir(parents=True, exist_ok=True)
 	vf_parts = [
 		f"scale='min({width},iw)':'min({height},ih)':force_original_aspect_ratio=decrease",
 		f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color=black",
-		f"zoompan=z='min(zoom+0.0015,1.1)':d={seconds*fps}:s={width}x{height}",
 	]
-	if overlay_textfile:
-		vf_parts.append(_build_drawtext_filter_from_file(overlay_textfile))
-	vf = ",".join(vf_parts)
+	if enable_kenburns:
+		# zoompan re-scales every output frame, so it is opt-in
+		vf_parts.append(f"zoompan=z='min(zoom+0.0015,1.1)':d={seconds*fps}:s={width}x{height}")
 	cmd = [
 		"ffmpeg", "-y", "-v", "error",
+		*_thread_args(threads),
 		"-loop", "1",
 		"-t", str(seconds),
 		"-i", str(src),
-		"-vf", vf,
+		"-vf", ",".join(vf_parts),
 		"-r", str(fps),
 		"-an",
-		"-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+		*_video_codec_args(still=not enable_kenburns),
+		"-threads", str(threads),
 		str(dst),
 	]
-	if _run_ffmpeg(cmd):
-		return True
-	# Retry without overlay
-	if overlay_textfile:
-		vf_no = ",".join(vf_parts[:-1])
-		cmd_no = [
-			"ffmpeg", "-y", "-v", "error",
-			"-loop", "1",
-			"-t", str(seconds),
-			"-i", str(src),
-			"-vf", vf_no,
-			"-r", str(fps),
-			"-an",
-			"-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
-			str(dst),
-		]
-		return _run_ffmpeg(cmd_no)
-	return False
+	return await _run_ffmpeg_async(cmd)
+
+
+def _write_concat_list(segments: List[Path], list_file: Path) -> Path:
+	list_file.parent.mkdir(parents=True, exist_ok=True)
+	paths = [seg.resolve().as_posix() for seg in segments]
+	list_file.write_bytes("".join(f"file '{p}'\n" for p in paths).encode("utf-8"))
+	return list_file
 
 
-def _concat_segments_ffmpeg(segments: List[Path], dst: Path) -> bool:
+async def _concat_segments_ffmpeg(segments: List[Path], dst: Path) -> bool:
 	if not segments:
 		return False
-	list_file = dst.with_suffix(".list.txt")
-	list_file.parent.mkdir(parents=True, exist_ok=True)
-	with open(list_file, "w", encoding="utf-8") as f:
-		for seg in segments:
-			abs_posix = seg.resolve().as_posix()
-			f.write(f"file '{abs_posix}'\n")
+	list_file = _write_concat_list(segments, dst.with_suffix(".list.txt"))
 	cmd = [
 		"ffmpeg", "-y", "-v", "error",
+		*_thread_args(),
 		"-f", "concat", "-safe", "0",
 		"-i", str(list_file.resolve()),
 		"-c", "copy",
 		str(dst),
 	]
-	return _run_ffmpeg(cmd)
+	return await _run_ffmpeg_async(cmd)
+
+
+async def _concat_and_burn(segments: List[Path], ass_path: Path, dst: Path) -> bool:
+	# Concat demuxer feeding the ASS burn directly, so the joined video is encoded once
+	if not segments:
+		return False
+	list_file = _write_concat_list(segments, dst.with_suffix(".list.txt"))
+	cmd = [
+		"ffmpeg", "-y", "-v", "error",
+		*_thread_args(),
+		"-f", "concat", "-safe", "0",
+		"-i", str(list_file.resolve()),
+		"-filter_complex", f"[0:v]{_ass_filter(ass_path)}[v]",
+		"-map", "[v]",
+		*_video_codec_args(),
+		str(dst),
+	]
+	return await _run_ffmpeg_async(cmd)
+
+
+async def _mux_audio(video_src: Path, audio_src: Path, dst: Path, loudnorm: bool = False) -> bool:
+	cmd = [
+		"ffmpeg", "-y", "-v", "error",
+		*_thread_args(),
+		"-i", str(video_src),
+		*_audio_input_args(audio_src),
+		"-map", "0:v:0", "-map", "1:a:0",
+		"-c:v", "copy", *_audio_codec_args(loudnorm),
+		"-shortest",
+		str(dst),
+	]
+	return await _run_ffmpeg_async(cmd)
 
 
-def _mux_audio(video_src: Path, audio_src: Path, dst: Path) -> bool:
+async def _remux_audio_genpts(video_src: Path, audio_src: Path, dst: Path) -> bool:
+	# Regenerated timestamps fix most concat/container mismatches that make a plain
+	# stream-copy mux fail, still without touching the video pixels
 	cmd = [
 		"ffmpeg", "-y", "-v", "error",
+		*_thread_args(),
+		"-fflags", "+genpts",
 		"-i", str(video_src),
-		"-i", str(audio_src),
+		*_audio_input_args(audio_src),
 		"-map", "0:v:0", "-map", "1:a:0",
-		"-c:v", "copy", "-c:a", "aac",
+		"-c:v", "copy", *_audio_codec_args(),
 		"-shortest",
 		str(dst),
 	]
-	return _run_ffmpeg(cmd)
+	return await _run_ffmpeg_async(cmd)
 
 
-def _black_fallback(dst: Path, width: int, height: int, fps: int, seconds: int, overlay_textfile: Path | None = None) -> bool:
+async def _render_black(dst: Path, width: int, height: int, fps: int, seconds: int, threads: int = _THREADS) -> bool:
 	cmd = [
 		"ffmpeg", "-y", "-v", "error",
+		*_thread_args(threads),
 		"-f", "lavfi", "-i", f"color=c=black:s={width}x{height}:r={fps}",
 		"-t", str(seconds),
+		*_video_codec_args(),
+		"-threads", str(threads),
+		str(dst),
+	]
+	return await _run_ffmpeg_async(cmd)
+
+
+# Cached clips being rendered right now, so concurrent segments wait for one encode
+_inflight: dict[Path, asyncio.Future] = {}
+
+
+async def _render_once(cached: Path, render: Callable[[Path], Awaitable[bool]]) -> bool:
+	# Render into a temp name and move it into place, so a failed or interrupted
+	# encode never leaves a truncated clip behind in the cache
+	if cached.exists():
+		return True
+	task = _inflight.get(cached)
+	if task is None:
+		async def run() -> bool:
+			cached.parent.mkdir(parents=True, exist_ok=True)
+			part = cached.with_name(f"{cached.stem}.part{cached.suffix}")
+			ok = await render(part)
+			if ok:
+				os.replace(part, cached)
+			else:
+				part.unlink(missing_ok=True)
+			return ok
+
+		task = asyncio.ensure_future(run())
+		_inflight[cached] = task
+		task.add_done_callback(lambda _t: _inflight.pop(cached, None))
+	return await asyncio.shield(task)
+
+
+def _link_or_copy(src: Path, dst: Path) -> bool:
+	try:
+		dst.unlink(missing_ok=True)
+		try:
+			os.link(src, dst)
+		except OSError:
+			shutil.copyfile(src, dst)
+		return True
+	except OSError as e:
+		print(f"Could not place {src.name} at {dst}: {e}")
+		return False
+
+
+async def _black_fallback(dst: Path, width: int, height: int, fps: int, seconds: int, threads: int = _THREADS) -> bool:
+	# Plain black clips only differ by (size, fps, seconds): encode each once under
+	# tmp_dir/_black_cache and hardlink it into every segment slot that needs it
+	cached = dst.parent / "_black_cache" / f"black_{width}x{height}_{fps}_{seconds}.mp4"
+	if not await _render_once(cached, lambda part: _render_black(part, width, height, fps, seconds, threads=threads)):
+		return False
+	return _link_or_copy(cached, dst)
+
+
+# Assets normalized to the output size/fps, shared across runs. Keyed on file
+# content rather than path, because every job downloads into a fresh directory;
+# capped at 1 GiB, evicting the least recently used first
+_NORMALIZED_CACHE = diskcache.Cache(str(CACHE_DIR / "normalized"), size_limit=1 << 30, eviction_policy="least-recently-used")
+_FINGERPRINT_CHUNK = 1 << 20
+
+
+def _asset_fingerprint(asset: Path) -> str | None:
+	# Size plus the first and last MiB: cheap, and stable across the hardlinks or
+	# copies the Pexels asset cache restores into each job
+	try:
+		size = asset.stat().st_size
+		h = hashlib.sha256(str(size).encode("utf-8"))
+		with open(asset, "rb") as f:
+			h.update(f.read(_FINGERPRINT_CHUNK))
+			if size > 2 * _FINGERPRINT_CHUNK:
+				f.seek(-_FINGERPRINT_CHUNK, os.SEEK_END)
+				h.update(f.read())
+	except OSError:
+		return None
+	return h.hexdigest()
+
+
+def _lookup_normalized(key: str, seconds: int, dst: Path) -> bool:
+	# The tag records how many seconds were encoded; a shorter clip is a miss
+	handle, length = _NORMALIZED_CACHE.get(key, read=True, tag=True)
+	if handle is None:
+		return False
+	with handle:
+		name = getattr(handle, "name", None)
+		if name is None or (length or 0) < seconds:
+			return False
+		return _link_or_copy(Path(name), dst)
+
+
+def _store_normalized(key: str, src: Path, seconds: int):
+	with open(src, "rb") as f:
+		_NORMALIZED_CACHE.set(key, f, read=True, tag=seconds)
+
+
+def _normalized_slot(fingerprint: str, width: int, height: int, fps: int, need: int, work_dir: Path) -> tuple[str, Path]:
+	# Cache key, and the job-local file a hit or a fresh encode is placed at
+	key = f"{fingerprint}|{width}x{height}@{fps}"
+	return key, work_dir / "_normalized" / f"norm_{fingerprint[:16]}_{width}x{height}_{fps}_{need}.mp4"
+
+
+async def _normalize_asset(asset: Path, width: int, height: int, fps: int, seconds: float, work_dir: Path, threads: int = _THREADS) -> Path | None:
+	# Only as many whole seconds as the segment needs are encoded
+	fingerprint = await asyncio.to_thread(_asset_fingerprint, asset)
+	if fingerprint is None:
+		return None
+	need = max(1, math.ceil(seconds))
+	key, local = _normalized_slot(fingerprint, width, height, fps, need, work_dir)
+
+	async def render(part: Path) -> bool:
+		if await asyncio.to_thread(_lookup_normalized, key, need, part):
+			return True
+		if not await _reencode_with_ffmpeg(asset, part, width, height, fps, max_seconds=need, threads=threads):
+			return False
+		await asyncio.to_thread(_store_normalized, key, part, need)
+		return True
+
+	return local if await _render_once(local, render) else None
+
+
+def _use_cached_normalized(plan: List[tuple[Path | None, float, Path]], width: int, height: int, fps: int, work_dir: Path) -> List[tuple[Path | None, float, Path]]:
+	# Swap in already normalized clips for the single-pass graph, so its scale/pad/fps
+	# chain runs on WxH@fps input; a miss keeps the raw asset, nothing is encoded here
+	longest: dict[Path, float] = {}
+	for asset, secs, _ in plan:
+		if asset is not None and asset.suffix.lower() == ".mp4":
+			longest[asset] = max(secs, longest.get(asset, 0.0))
+	swap: dict[Path, Path] = {}
+	for asset, secs in longest.items():
+		fingerprint = _asset_fingerprint(asset)
+		if fingerprint is None:
+			continue
+		need = max(1, math.ceil(secs))
+		key, local = _normalized_slot(fingerprint, width, height, fps, need, work_dir)
+		local.parent.mkdir(parents=True, exist_ok=True)
+		if local.exists() or _lookup_normalized(key, need, local):
+			swap[asset] = local
+	return [(swap.get(asset, asset) if asset is not None else None, secs, seg_path) for asset, secs, seg_path in plan]
+
+
+async def _trim_copy(src: Path, dst: Path, seconds: float | None) -> bool:
+	# Stream copy from the start (a keyframe), so only the cut point is approximate
+	cmd = [
+		"ffmpeg", "-y", "-v", "error",
+		"-ss", "0",
+		"-i", str(src),
 	]
-	if overlay_textfile:
-		vf = _build_drawtext_filter_from_file(overlay_textfile)
-		cmd.extend(["-vf", vf])
-	cmd.extend(["-c:v", "libx264", "-pix_fmt", "yuv420p", str(dst)])
-	return _run_ffmpeg(cmd)
+	if seconds is not None:
+		cmd.extend(["-t", f"{seconds:.3f}"])
+	cmd.extend(["-c", "copy", "-an", str(dst)])
+	return await _run_ffmpeg_async(cmd)
+
+
+def _single_pass_inputs_ok(plan: List[tuple[Path | None, float, Path]]) -> bool:
+	# Every video asset must be readable up front; a failing input would sink the
+	# whole single-pass graph, while the per-segment path can black it out alone
+	for asset in {a for a, _, _ in plan if a is not None}:
+		if not asset.exists():
+			return False
+		if asset.suffix.lower() == ".mp4" and _ffprobe_duration_seconds(asset) is None:
+			return False
+	return True
+
+
+def _build_concat_graph(plan: List[tuple[Path | None, float, Path]], width: int, height: int, fps: int, ass_path: Path) -> tuple[list[str], str]:
+	# One input per planned segment (assets cycle, so a file may appear more than
+	# once), each normalized to WxH@fps and cut to its line's duration
+	inputs: list[str] = []
+	chains: list[str] = []
+	for i, (asset, secs, _seg_path) in enumerate(plan):
+		if asset is None:
+			inputs.extend(["-f", "lavfi", "-t", f"{secs:.3f}", "-i", f"color=c=black:s={width}x{height}:r={fps}"])
+		elif asset.suffix.lower() == ".mp4":
+			inputs.extend([*_hwaccel_input_args(), "-i", str(asset)])
+		else:
+			inputs.extend(["-loop", "1", "-t", f"{secs:.3f}", "-i", str(asset)])
+		chains.append(
+			f"[{i}:v]scale='min({width},iw)':'min({height},ih)':force_original_aspect_ratio=decrease,"
+			f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color=black,fps={fps},"
+			f"trim=duration={secs:.3f},setpts=PTS-STARTPTS,setsar=1,format=yuv420p[v{i}]"
+		)
+	labels = "".join(f"[v{i}]" for i in range(len(plan)))
+	graph = ";".join(chains) + f";{labels}concat=n={len(plan)}:v=1:a=0[cv];[cv]{_ass_filter(ass_path)}[vout]"
+	return inputs, graph
+
+
+async def _render_single_pass(plan: List[tuple[Path | None, float, Path]], voiceover: Path, ass_path: Path, width: int, height: int, fps: int, dst: Path) -> bool:
+	inputs, graph = _build_concat_graph(plan, width, height, fps, ass_path)
+	cmd = [
+		"ffmpeg", "-y", "-v", "error",
+		*_thread_args(),
+		*inputs,
+		*_audio_input_args(voiceover),
+		"-filter_complex", graph,
+		"-map", "[vout]", "-map", f"{len(plan)}:a:0",
+		*_video_codec_args(),
+		*_audio_codec_args(),
+		"-shortest",
+		str(dst),
+	]
+	return await _run_ffmpeg_async(cmd)
+
+
+async def _finalize_output(final_tmp: Path, out_path: Path) -> Path:
+	out_path.parent.mkdir(parents=True, exist_ok=True)
+	try:
+		os.replace(final_tmp, out_path)
+	except Exception:
+		await _run_ffmpeg_async(["ffmpeg", "-y", "-v", "error", "-i", str(final_tmp), "-c", "copy", str(out_path)])
+	return out_path
+
+
+async def _prepare_one_async(sem: asyncio.Semaphore, asset: Path | None, secs: float, seg_path: Path, width: int, height: int, fps: int, threads: int = _THREADS) -> tuple[Path, bool]:
+	# Render one line's clip from its asset; black when there is no asset or it fails
+	async with sem:
+		return await _prepare_one(asset, secs, seg_path, width, height, fps, threads)
+
+
+async def _prepare_one(asset: Path | None, secs: float, seg_path: Path, width: int, height: int, fps: int, threads: int = _THREADS) -> tuple[Path, bool]:
+	ok = False
+	if asset is not None:
+		if asset.suffix.lower() == ".mp4":
+			normalized = await _normalize_asset(asset, width, height, fps, secs, seg_path.parent, threads)
+			ok = normalized is not None and await _trim_copy(normalized, seg_path, secs)
+			if not ok:
+				ok = await _reencode_with_ffmpeg(asset, seg_path, width, height, fps, max_seconds=secs, threads=threads)
+		else:
+			ok = await _image_to_video(asset, seg_path, width, height, fps, seconds=int(secs), threads=threads)
+	if not ok:
+		ok = await _black_fallback(seg_path, width, height, fps, seconds=int(secs), threads=threads)
+	return seg_path, ok
 
 
 def create_video_with_subtitles(assets: List[Path], voiceover: Path, segments: List[Dict[str, str]], width: int, height: int, fps: int, max_duration: int, out_path: Path) -> Path:
+	return asyncio.run(create_video_with_subtitles_async(assets, voiceover, segments, width, height, fps, max_duration, out_path))
+
+
+async def create_video_with_subtitles_async(assets: List[Path], voiceover: Path, segments: List[Dict[str, str]], width: int, height: int, fps: int, max_duration: int, out_path: Path) -> Path:
 	tmp_dir = out_path.parent / "tmp_v"
 	tmp_dir.mkdir(parents=True, exist_ok=True)
 
 	# Derive per-line duration from narration duration, capped by max_duration
-	audio_dur = _ffprobe_duration_seconds(voiceover) or float(max_duration)
+	audio_dur = _audio_duration_seconds(voiceover) or float(max_duration)
 	target_total = min(float(max_duration), audio_dur)
 	num_lines = max(1, len(segments))
 	per_line = max(0.8, target_total / num_lines)  # at least ~0.8s per line
 
-	# Prepare one segment per line, cycling assets as needed
-	prepared: List[Path] = []
+	# Plan one segment per line, cycling assets as needed. Durations are known up
+	# front, so the ffmpeg jobs themselves can run side by side.
+	plan: List[tuple[Path | None, float, Path]] = []
 	used = 0.0
-	durations: List[float] = []
-	if not assets:
-		# if no assets, use black clips per line
-		for i in range(num_lines):
-			if used >= target_total - 0.01:
-				break
-			seg_path = tmp_dir / f"seg_{i}.mp4"
-			secs = min(per_line, target_total - used)
-			_black_fallback(seg_path, width, height, fps, seconds=int(secs))
-			prepared.append(seg_path)
-			durations.append(secs)
-			used += secs
-	else:
-		for i in range(num_lines):
-			if used >= target_total - 0.01:
-				break
-			asset = assets[i % len(assets)]
-			seg_path = tmp_dir / f"seg_{i}.mp4"
-			secs = min(per_line, target_total - used)
-			if asset.suffix.lower() == ".mp4":
-				_ok = _reencode_with_ffmpeg(asset, seg_path, width, height, fps, max_seconds=secs)
-				if not _ok:
-					# fallback to black if this asset fails
-					_black_fallback(seg_path, width, height, fps, seconds=int(secs))
-			else:
-				_ok = _image_to_video(asset, seg_path, width, height, fps, seconds=int(secs))
-				if not _ok:
-					_black_fallback(seg_path, width, height, fps, seconds=int(secs))
-			prepared.append(seg_path)
-			durations.append(secs)
-			used += secs
-
-	if not prepared:
+	for i in range(num_lines):
+		if used >= target_total - 0.01:
+			break
+		asset = assets[i % len(assets)] if assets else None
+		secs = min(per_line, target_total - used)
+		plan.append((asset, secs, tmp_dir / f"seg_{i}.mp4"))
+		used += secs
+
+	if not plan:
 		# final safety
-		first_text = (segments[0]["text"].strip() if segments and segments[0].get("text") else "")
-		black = tmp_dir / "black.mp4"
-		_black_fallback(black, width, height, fps, seconds=int(target_total))
-		prepared.append(black)
-		durations.append(float(target_total))
+		plan.append((None, float(target_total), tmp_dir / "black.mp4"))
+	durations: List[float] = [secs for _, secs, _ in plan]
 
-	concat_out = tmp_dir / "concat.mp4"
-	if len(prepared) == 1:
-		try:
-			os.replace(prepared[0], concat_out)
-		except Exception:
-			_ = _reencode_with_ffmpeg(prepared[0], concat_out, width, height, fps)
-	else:
-		_ = _concat_segments_ffmpeg(prepared, concat_out)
+	# Write SRT/ASS for the whole video; both render paths burn the ASS file
+	srt, ass = _write_subtitles(tmp_dir, segments[:len(durations)], durations)
 
-	# Write ASS for the whole video and burn subtitles onto the concatenated video
-	srt = _write_srt(tmp_dir, segments[:len(durations)], durations)
-	ass = _write_ass(tmp_dir, segments[:len(durations)], durations)
-	# Try burning ASS (reliable styling via libass)
+	# Preferred path: a single ffmpeg pass that scales, concatenates, burns the
+	# subtitles and muxes the narration, with no intermediate files
+	final_tmp = tmp_dir / "final_with_audio.mp4"
+	if _filter_ok("ass"):
+		single_plan = await asyncio.to_thread(_use_cached_normalized, plan, width, height, fps, tmp_dir)
+		if await asyncio.to_thread(_single_pass_inputs_ok, single_plan) and await _render_single_pass(single_plan, voiceover, ass, width, height, fps, final_tmp):
+			return await _finalize_output(final_tmp, out_path)
+
+	# Fallback: prepare each segment separately, then concat, burn and mux
+	# Consumer NVIDIA cards only allow a few concurrent NVENC sessions
+	workers = min(len(plan), 3 if _has_nvenc() else _THREADS)
+	sem = asyncio.Semaphore(workers)
+	# Split the CPU between the jobs running side by side instead of oversubscribing
+	threads = max(1, _THREADS // workers)
+	results = await asyncio.gather(
+		*(_prepare_one_async(sem, asset, secs, seg_path, width, height, fps, threads) for asset, secs, seg_path in plan),
+		return_exceptions=True,
+	)
+	for result in results:
+		if isinstance(result, BaseException):
+			print(f"Segment preparation failed: {result}")
+	prepared: List[Path] = [seg_path for _, _, seg_path in plan]
+
+	# Concatenate and burn the subtitles in one run; the two-step path below is the fallback
+	concat_out = tmp_dir / "concat.mp4"
 	burned = tmp_dir / "concat_subs.mp4"
-	try:
-		cmd_burn = [
-			"ffmpeg", "-y", "-v", "error",
-			"-i", str(concat_out),
-			"-vf", f"ass={ass.as_posix()}",
-			"-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
-			str(burned),
-		]
-		if _run_ffmpeg(cmd_burn):
-			concat_for_audio = burned
-		else:
-			# Try embedding as soft subtitles (mov_text) as a fallback
-			soft = tmp_dir / "concat_with_soft_subs.mp4"
+	if _filter_ok("ass") and await _concat_and_burn(prepared, ass, burned):
+		concat_for_audio = burned
+	else:
+		if len(prepared) == 1:
 			try:
-				cmd_soft = [
-					"ffmpeg", "-y", "-v", "error",
-					"-i", str(concat_out),
-					"-i", str(srt),
-					"-c:v", "copy", "-c:s", "mov_text",
-					str(soft),
-				]
-				if _run_ffmpeg(cmd_soft):
-					concat_for_audio = soft
-				else:
-					concat_for_audio = concat_out
+				os.replace(prepared[0], concat_out)
 			except Exception:
-				concat_for_audio = concat_out
-	except Exception:
-		concat_for_audio = concat_out
+				_ = await _reencode_with_ffmpeg(prepared[0], concat_out, width, height, fps)
+		else:
+			_ = await _concat_segments_ffmpeg(prepared, concat_out)
+
+		# Burn the ASS subtitles onto the concatenated video (reliable styling via libass)
+		try:
+			cmd_burn = [
+				"ffmpeg", "-y", "-v", "error",
+				*_thread_args(),
+				"-i", str(concat_out),
+				"-vf", _ass_filter(ass),
+				*_video_codec_args(),
+				str(burned),
+			]
+			if _filter_ok("ass") and await _run_ffmpeg_async(cmd_burn):
+				concat_for_audio = burned
+			else:
+				# Try embedding as soft subtitles (mov_text) as a fallback
+				soft = tmp_dir / "concat_with_soft_subs.mp4"
+				try:
+					cmd_soft = [
+						"ffmpeg", "-y", "-v", "error",
+						*_thread_args(),
+						"-i", str(concat_out),
+						"-i", str(srt),
+						"-c:v", "copy", "-c:s", "mov_text",
+						str(soft),
+					]
+					if await _run_ffmpeg_async(cmd_soft):
+						concat_for_audio = soft
+					else:
+						concat_for_audio = concat_out
+				except Exception:
+					concat_for_audio = concat_out
+		except Exception:
+			concat_for_audio = concat_out
 
 	# Mux narration audio onto the concatenated (and possibly burned) video
-	final_tmp = tmp_dir / "final_with_audio.mp4"
-	if not _mux_audio(concat_for_audio, voiceover, final_tmp):
+	if not await _mux_audio(concat_for_audio, voiceover, final_tmp) and not await _remux_audio_genpts(concat_for_audio, voiceover, final_tmp):
 		cmd = [
 			"ffmpeg", "-y", "-v", "error",
+			*_thread_args(),
 			"-i", str(concat_for_audio),
-			"-i", str(voiceover),
-			"-c:v", "libx264", "-c:a", "aac", "-shortest",
+			*_audio_input_args(voiceover),
+			*_video_codec_args(), *_audio_codec_args(), "-shortest",
 			str(final_tmp),
 		]
-		if not _run_ffmpeg(cmd):
-			if concat_out.exists():
-				os.replace(concat_out, out_path)
+		if not await _run_ffmpeg_async(cmd):
+			if concat_for_audio.exists():
+				os.replace(concat_for_audio, out_path)
 				return out_path
 			else:
-				raise
+				raise RuntimeError("ffmpeg could not produce the final video")
 
-	out_path.parent.mkdir(parents=True, exist_ok=True)
-	try:
-		os.replace(final_tmp, out_path)
-	except Exception:
-		subprocess.run(["ffmpeg", "-y", "-v", "error", "-i", str(final_tmp), "-c", "copy", str(out_path)], check=False)
-
-	return out_path
+	return await _finalize_output(final_tmp, out_path)
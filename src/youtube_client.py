@@ -2,20 +2,30 @@ from __future__ import annotations
 from pathlib import Path
 import os
 import json
-from typing import Optional
-
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-import google.auth.exceptions
+import time
+from typing import Any, Optional
 
 SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
 TOKEN_FILE = "token.json"
 CLIENT_SECRET_FILE = "client_secret.json"
 
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+RETRIABLE_STATUS = (429, 500, 502, 503, 504)
+MAX_CHUNK_RETRIES = 5
+
+# The Google client libraries are imported inside the functions so that runs which
+# never upload do not pay for them; the built service is reused for the process
+_service: Any = None
+
 
 def get_youtube_service() -> any:
+    global _service
+    if _service is not None:
+        return _service
+    from googleapiclient.discovery import build
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+
     creds = None
     if os.path.exists(TOKEN_FILE):
         with open(TOKEN_FILE, "r") as token:
@@ -31,10 +41,14 @@ def get_youtube_service() -> any:
             creds = flow.run_local_server(port=0)
         with open(TOKEN_FILE, "w") as token:
             token.write(creds.to_json())
-    return build("youtube", "v3", credentials=creds)
+    _service = build("youtube", "v3", credentials=creds)
+    return _service
 
 
 def upload_short(youtube, video_path: Path, title: str, description: str, tags: list[str] | None = None, privacy_status: str = "private") -> str:
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import MediaFileUpload
+
     body = {
         "snippet": {
             "title": title[:100],
@@ -44,10 +58,19 @@ def upload_short(youtube, video_path: Path, title: str, description: str, tags:
         },
         "status": {"privacyStatus": privacy_status, "selfDeclaredMadeForKids": False},
     }
-    media = MediaFileUpload(str(video_path), chunksize=-1, resumable=True, mimetype="video/*")
+    # Bounded chunks keep memory flat and let a failed chunk be re-sent on its own
+    media = MediaFileUpload(str(video_path), chunksize=UPLOAD_CHUNK_SIZE, resumable=True, mimetype="video/mp4")
     request = youtube.videos().insert(part=",".join(body.keys()), body=body, media_body=media)
     response = None
+    attempt = 0
     while response is None:
-        status, response = request.next_chunk()
+        try:
+            status, response = request.next_chunk()
+            attempt = 0
+        except HttpError as e:
+            if e.resp.status not in RETRIABLE_STATUS or attempt >= MAX_CHUNK_RETRIES - 1:
+                raise
+            time.sleep(2 ** attempt)
+            attempt += 1
     video_id = response.get("id")
     return video_id